@@ -1,18 +1,14 @@
 import os
+import re
+import atexit
+import csv
 import smtplib
 import base64
-import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use("Agg")  # Non-interactive backend for server use
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.colors import LinearSegmentedColormap
 from math import erf, sqrt
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
-from collections import defaultdict
 from io import BytesIO
 
 # ==============================================================================
@@ -31,6 +27,8 @@ EMAIL_RECIPIENT = os.environ.get("EMAIL_RECIPIENT", "")
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 
+NUMBER_TOKEN_RE = re.compile(r"\d+")
+
 # ==============================================================================
 # KENO BOARD LAYOUT
 # ==============================================================================
@@ -41,7 +39,7 @@ def get_position(number):
     n = number - 1
     return n // BOARD_COLS, n % BOARD_COLS
 
-def get_neighbors(number):
+def _compute_neighbors(number):
     row, col = get_position(number)
     neighbors = []
     for dr in [-1, 0, 1]:
@@ -53,12 +51,28 @@ def get_neighbors(number):
                 neighbors.append(r * BOARD_COLS + c + 1)
     return neighbors
 
+# The board never changes, so neighbor lists are built once at import
+_NEIGH_CACHE = {n: tuple(_compute_neighbors(n)) for n in range(1, 81)}
+
+def get_neighbors(number):
+    return _NEIGH_CACHE[number]
+
 def get_board_region(number):
     row, col = get_position(number)
     vertical = "Top" if row < 3 else ("Middle" if row < 5 else "Bottom")
     horizontal = "Left" if col < 4 else ("Center" if col < 6 else "Right")
     return f"{vertical}-{horizontal}"
 
+# 80x80 adjacency (self included) so cluster averages become one matrix product
+BOARD_ADJ = np.eye(80)
+for _n in range(1, 81):
+    for _nb in get_neighbors(_n):
+        BOARD_ADJ[_n - 1, _nb - 1] = 1.0
+BOARD_DEG = BOARD_ADJ.sum(axis=1)
+
+REGION_NAMES = tuple(f"{v}-{h}" for v in ("Top", "Middle", "Bottom") for h in ("Left", "Center", "Right"))
+REGION_ID = np.array([REGION_NAMES.index(get_board_region(n)) for n in range(1, 81)], dtype=np.int8)
+
 # ==============================================================================
 # STATISTICS
 # ==============================================================================
@@ -66,15 +80,17 @@ def norm_cdf(z):
     return (1.0 + erf(z / sqrt(2.0))) / 2.0
 
 def calculate_z_score(observed, n_games):
+    # observed is the array of per-number hit counts
     p = 20 / 80
     expected = n_games * p
     std_dev = sqrt(n_games * p * (1 - p))
     if std_dev == 0:
-        return 0.0
+        return np.zeros_like(observed, dtype=np.float64)
     return (observed - expected) / std_dev
 
-def z_to_confidence(z):
-    return norm_cdf(z) * 100.0
+def z_to_confidence(z_scores):
+    # Exact CDF for each of the 80 z-scores; cheaper per run than building a lookup table
+    return np.array([norm_cdf(z) for z in z_scores]) * 100.0
 
 # ==============================================================================
 # CORE ANALYSIS
@@ -83,67 +99,72 @@ def load_and_prepare_data():
     if not os.path.exists(CSV_FILE):
         print("[Analyzer] No results.csv found. Skipping analysis.")
         return None
-    df = pd.read_csv(CSV_FILE, dtype={"Game ID": str})
-    df["Game ID"] = df["Game ID"].astype(int)
-    df = df.sort_values("Game ID", ascending=True)
-    if len(df) < MIN_GAMES_REQUIRED:
-        print(f"[Analyzer] Only {len(df)} games available. Need at least {MIN_GAMES_REQUIRED}. Skipping.")
+    with open(CSV_FILE, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        # Only Game ID and Numbers are needed; skip building a dict per row
+        id_col, num_col = header.index("Game ID"), header.index("Numbers")
+        rows = [(int(r[id_col]), r[num_col]) for r in reader if r]
+    if len(rows) < MIN_GAMES_REQUIRED:
+        print(f"[Analyzer] Only {len(rows)} games available. Need at least {MIN_GAMES_REQUIRED}. Skipping.")
         return None
-    df = df.tail(GAMES_TO_ANALYZE).reset_index(drop=True)
-    print(f"[Analyzer] Analyzing {len(df)} games (Game IDs {df['Game ID'].iloc[0]} to {df['Game ID'].iloc[-1]}).")
-    return df
-
-def count_frequencies(df):
-    freq = defaultdict(int)
-    for _, row in df.iterrows():
-        parts = str(row["Numbers"]).replace(",", "-").split("-")
-        for part in parts:
-            part = part.strip()
-            if part.isdigit():
-                n = int(part)
-                if 1 <= n <= 80:
-                    freq[n] += 1
-    return freq
+    # Order by Game ID as the analysis always has; file order differs since IDs wrap after 999
+    rows.sort(key=lambda r: r[0])
+    rows = rows[-GAMES_TO_ANALYZE:]
+    print(f"[Analyzer] Analyzing {len(rows)} games (Game IDs {rows[0][0]} to {rows[-1][0]}).")
+    return [numbers for _, numbers in rows]
+
+def count_frequencies(draws):
+    blob = "-".join(draws)
+    arr = np.fromiter(map(int, NUMBER_TOKEN_RE.findall(blob)), dtype=np.int64)
+    arr = arr[(arr >= 1) & (arr <= 80)]
+    return np.bincount(arr, minlength=81)[1:]
 
 def calculate_scores(freq, n_games):
-    z_scores = {n: calculate_z_score(freq.get(n, 0), n_games) for n in range(1, 81)}
+    z_scores = calculate_z_score(freq, n_games)
 
-    cluster_scores = {}
-    for n in range(1, 81):
-        neighbors = get_neighbors(n)
-        all_z = [z_scores[n]] + [z_scores[nb] for nb in neighbors]
-        cluster_scores[n] = sum(all_z) / len(all_z)
+    cluster_scores = (BOARD_ADJ @ z_scores) / BOARD_DEG
 
-    weighted_scores = {n: (0.6 * cluster_scores[n]) + (0.4 * z_scores[n]) for n in range(1, 81)}
-    confidence = {n: z_to_confidence(z_scores[n]) for n in range(1, 81)}
+    weighted_scores = 0.6 * cluster_scores + 0.4 * z_scores
+    confidence = z_to_confidence(z_scores)
 
     return z_scores, cluster_scores, weighted_scores, confidence
 
 def select_top_10(weighted_scores):
-    ranked = sorted(weighted_scores.keys(), key=lambda n: weighted_scores[n], reverse=True)
-    return ranked[:10]
+    # Partition around the 10th-largest score instead of sorting all 80.
+    # Ties keep the lower number first, as the previous stable sort did.
+    kth = np.partition(weighted_scores, len(weighted_scores) - 10)[len(weighted_scores) - 10]
+    candidates = np.flatnonzero(weighted_scores >= kth)
+    order = np.argsort(-weighted_scores[candidates], kind="stable")
+    return (candidates[order[:10]] + 1).tolist()
 
 def find_dominant_cluster_region(top_10):
-    region_counts = defaultdict(int)
-    for n in top_10:
-        region_counts[get_board_region(n)] += 1
-    return max(region_counts, key=region_counts.get)
+    ids = REGION_ID[np.asarray(top_10) - 1]
+    counts = np.bincount(ids, minlength=len(REGION_NAMES))
+    # Ties go to the region that appears first in the ranking
+    return REGION_NAMES[ids[counts[ids].argmax()]]
+
+def analyze_draws(draws):
+    # Full counts → z → cluster → weighted → top 10 pipeline over NumPy arrays.
+    # The 80-element arrays are still returned because the heatmap colors every cell;
+    # freq, z_scores, weighted_scores and confidence are all indexed by number - 1.
+    freq = count_frequencies(draws)
+    z_scores, cluster_scores, weighted_scores, confidence = calculate_scores(freq, len(draws))
+    top_10 = select_top_10(weighted_scores)
+    dominant_region = find_dominant_cluster_region(top_10)
+    return freq, z_scores, weighted_scores, confidence, top_10, dominant_region
 
 # ==============================================================================
 # HEATMAP GENERATION
 # ==============================================================================
-def generate_heatmap(weighted_scores, confidence, top_10, n_games):
+def _build_heatmap_figure(grid):
     """
-    Generate an 8x10 keno board heatmap colored by spatial weighted score.
-    Top 10 numbers are circled and labeled with their confidence percentage.
-    Returns image bytes and also saves to disk.
+    Build the static parts of the heatmap (colormap, grid lines, axis labels,
+    colorbar, suptitle, legend). generate_heatmap adds the labels and circles.
     """
-
-    # Build the 8x10 grid of weighted scores
-    grid = np.zeros((BOARD_ROWS, BOARD_COLS))
-    for n in range(1, 81):
-        row, col = get_position(n)
-        grid[row, col] = weighted_scores[n]
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    from matplotlib.colors import LinearSegmentedColormap
 
     # Custom colormap: deep blue (cold) → black (neutral) → deep red (hot)
     colors = [
@@ -161,42 +182,7 @@ def generate_heatmap(weighted_scores, confidence, top_10, n_games):
     ax.set_facecolor("#0d0d0d")
 
     # Draw the heatmap
-    im = ax.imshow(grid, cmap=cmap, aspect="auto", interpolation="gaussian")
-
-    # Draw each number cell
-    for n in range(1, 81):
-        row, col = get_position(n)
-        is_top10 = n in top_10
-        conf = confidence[n]
-
-        # Number label — white for top 10, gray for others
-        label_color = "white" if is_top10 else "#888888"
-        fontsize = 11 if is_top10 else 9
-        fontweight = "bold" if is_top10 else "normal"
-
-        ax.text(col, row, str(n),
-                ha="center", va="center" if not is_top10 else "top",
-                color=label_color,
-                fontsize=fontsize,
-                fontweight=fontweight)
-
-        # For top 10: add confidence % below the number and draw a circle
-        if is_top10:
-            ax.text(col, row + 0.22, f"{conf:.0f}%",
-                    ha="center", va="center",
-                    color="#FFD700",
-                    fontsize=7.5,
-                    fontweight="bold")
-
-            # Gold circle outline
-            circle = mpatches.Circle(
-                (col, row), 0.44,
-                linewidth=2.2,
-                edgecolor="#FFD700",
-                facecolor="none",
-                zorder=5
-            )
-            ax.add_patch(circle)
+    im = ax.imshow(grid, cmap=cmap, aspect="auto", interpolation="nearest")
 
     # Grid lines
     for x in np.arange(-0.5, BOARD_COLS, 1):
@@ -217,12 +203,8 @@ def generate_heatmap(weighted_scores, confidence, top_10, n_games):
     plt.setp(cbar.ax.yaxis.get_ticklabels(), color="white", fontsize=8)
     cbar.set_label("Spatial Weighted Score", color="white", fontsize=9)
 
-    # Title and subtitle
-    top_10_str = "  |  ".join([f"{n} ({confidence[n]:.0f}%)" for n in top_10])
     fig.suptitle("Keno Bias Heatmap — Spatial Weighted Score",
                  color="white", fontsize=15, fontweight="bold", y=0.98)
-    ax.set_title(f"Top 10: {top_10_str}\nBased on last {n_games} games",
-                 color="#aaaaaa", fontsize=8, pad=10)
 
     # Legend
     legend_elements = [
@@ -236,21 +218,78 @@ def generate_heatmap(weighted_scores, confidence, top_10, n_games):
               facecolor="#1a1a1a", edgecolor="#444",
               labelcolor="white", fontsize=8)
 
-    plt.tight_layout(rect=[0, 0.03, 1, 0.96])
+    return fig, ax
 
-    # Save to disk (for GitHub repository)
-    plt.savefig(HEATMAP_FILE, dpi=150, bbox_inches="tight",
-                facecolor=fig.get_facecolor())
-    print(f"[Heatmap] Saved to {HEATMAP_FILE}")
+def generate_heatmap(weighted_scores, confidence, top_10, n_games):
+    """
+    Generate an 8x10 keno board heatmap colored by spatial weighted score.
+    Top 10 numbers are circled and labeled with their confidence percentage.
+    Returns image bytes and also saves to disk.
+    """
+    # Imported here so runs that skip analysis never pay matplotlib's startup cost
+    import matplotlib
+    matplotlib.use("Agg")  # Non-interactive backend for server use
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    import matplotlib.patheffects as patheffects
+    from matplotlib.collections import PatchCollection
 
-    # Also return as bytes (for email embedding)
+    # Build the 8x10 grid of weighted scores
+    grid = np.zeros((BOARD_ROWS, BOARD_COLS))
+    for n in range(1, 81):
+        row, col = get_position(n)
+        grid[row, col] = weighted_scores[n - 1]
+
+    fig, ax = _build_heatmap_figure(grid)
+
+    # Label styles are built once and shared across cells — white for top 10, gray for others.
+    # Top-10 annotations get a dark outline so they stay readable on the gold top cell.
+    outline = [patheffects.withStroke(linewidth=2.5, foreground="black")]
+    top_label_style = dict(ha="center", va="top", color="white", fontsize=11, fontweight="bold",
+                           path_effects=outline)
+    other_label_style = dict(ha="center", va="center", color="#888888", fontsize=9, fontweight="normal")
+    conf_label_style = dict(ha="center", va="center", color="#FFD700", fontsize=7.5, fontweight="bold",
+                            path_effects=outline)
+
+    # Draw each number cell
+    top_set = set(top_10)
+    circles = []
+    for n in range(1, 81):
+        row, col = get_position(n)
+        if n not in top_set:
+            ax.text(col, row, str(n), **other_label_style)
+            continue
+
+        # For top 10: add confidence % below the number and queue a circle
+        ax.text(col, row, str(n), **top_label_style)
+        ax.text(col, row + 0.22, f"{confidence[n - 1]:.0f}%", **conf_label_style)
+        circles.append(mpatches.Circle((col, row), 0.44))
+
+    # Gold circle outlines over a dark under-stroke, drawn as one collection
+    ring = PatchCollection(circles, linewidth=2.2, edgecolor="#FFD700", facecolor="none", zorder=5)
+    ring.set_path_effects([patheffects.Stroke(linewidth=4.4, foreground="black"), patheffects.Normal()])
+    ax.add_collection(ring)
+
+    # Subtitle
+    top_10_str = "  |  ".join([f"{n} ({confidence[n - 1]:.0f}%)" for n in top_10])
+    ax.set_title(f"Top 10: {top_10_str}\nBased on last {n_games} games",
+                 color="#aaaaaa", fontsize=8, pad=10)
+
+    fig.tight_layout(rect=[0, 0.03, 1, 0.96])
+
+    # Render once, then reuse the same bytes for disk and email embedding
     buf = BytesIO()
-    plt.savefig(buf, format="png", dpi=150, bbox_inches="tight",
-                facecolor=fig.get_facecolor())
-    buf.seek(0)
-    img_bytes = buf.read()
+    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight",
+                facecolor=fig.get_facecolor(),
+                pil_kwargs={"optimize": True, "compress_level": 9})
+    img_bytes = buf.getvalue()
     plt.close(fig)
 
+    # Save to disk (for GitHub repository)
+    with open(HEATMAP_FILE, "wb") as f:
+        f.write(img_bytes)
+    print(f"[Heatmap] Saved to {HEATMAP_FILE}")
+
     print("[Heatmap] Generated successfully.")
     return img_bytes
 
@@ -258,11 +297,11 @@ def generate_heatmap(weighted_scores, confidence, top_10, n_games):
 # EMAIL
 # ==============================================================================
 def build_email_html(top_10, confidence, freq, n_games, dominant_region):
-    qualifying = [n for n in top_10 if confidence[n] >= ALERT_THRESHOLD]
+    qualifying = [n for n in top_10 if confidence[n - 1] >= ALERT_THRESHOLD]
     if qualifying:
         combined_p = 1.0
         for n in qualifying:
-            combined_p *= (1.0 - confidence[n] / 100.0)
+            combined_p *= (1.0 - confidence[n - 1] / 100.0)
         verdict = f"The probability of this cluster appearing by chance is less than {combined_p * 100:.2f}%."
     else:
         verdict = "Numbers are elevated but have not reached the strongest bias threshold."
@@ -270,8 +309,8 @@ def build_email_html(top_10, confidence, freq, n_games, dominant_region):
     rows_html = ""
     expected = round(n_games * 0.25, 1)
     for rank, n in enumerate(top_10, 1):
-        conf = confidence[n]
-        hits = freq.get(n, 0)
+        conf = confidence[n - 1]
+        hits = int(freq[n - 1])
         region = get_board_region(n)
 
         if conf >= 99:
@@ -324,6 +363,41 @@ def build_email_html(top_10, confidence, freq, n_games, dominant_region):
     </div>
     </body></html>"""
 
+# SMTP session kept open across alerts in the same process
+_SMTP = None
+
+def get_smtp_connection():
+    global _SMTP
+    if _SMTP is not None:
+        try:
+            if _SMTP.noop()[0] == 250:
+                return _SMTP
+        except (smtplib.SMTPException, OSError):
+            pass
+        close_smtp_connection()
+    # Only cache the session once it is authenticated
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+    try:
+        server.starttls()
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    _SMTP = server
+    return _SMTP
+
+def close_smtp_connection():
+    global _SMTP
+    if _SMTP is None:
+        return
+    try:
+        _SMTP.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+    _SMTP = None
+
+atexit.register(close_smtp_connection)
+
 def send_email(subject, html_body, img_bytes):
     if not all([EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENT]):
         print("[Email] Missing credentials. Check GitHub Secrets.")
@@ -344,10 +418,8 @@ def send_email(subject, html_body, img_bytes):
         img.add_header("Content-Disposition", "inline", filename="heatmap.png")
         msg.attach(img)
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, EMAIL_RECIPIENT, msg.as_string())
+        server = get_smtp_connection()
+        server.sendmail(EMAIL_SENDER, EMAIL_RECIPIENT, msg.as_string())
 
         print(f"[Email] Alert sent successfully to {EMAIL_RECIPIENT}.")
         return True
@@ -363,28 +435,24 @@ def run_analyzer():
     print("[Analyzer] Starting Keno Bias Analysis...")
     print("=" * 60)
 
-    df = load_and_prepare_data()
-    if df is None:
+    draws = load_and_prepare_data()
+    if draws is None:
         return
 
-    n_games = len(df)
-    freq = count_frequencies(df)
-
-    z_scores, cluster_scores, weighted_scores, confidence = calculate_scores(freq, n_games)
-    top_10 = select_top_10(weighted_scores)
-    dominant_region = find_dominant_cluster_region(top_10)
+    n_games = len(draws)
+    freq, z_scores, weighted_scores, confidence, top_10, dominant_region = analyze_draws(draws)
 
     print(f"\n[Analyzer] Top 10 Numbers by Spatial Weighted Score:")
     print(f"{'Rank':<6}{'Number':<10}{'Hits':<8}{'Expected':<12}{'Z-Score':<12}{'Confidence':<14}{'Region'}")
     print("-" * 75)
     expected = round(n_games * 0.25, 1)
     for rank, n in enumerate(top_10, 1):
-        print(f"{rank:<6}{n:<10}{freq.get(n,0):<8}{expected:<12}{z_scores[n]:<12.3f}{confidence[n]:<14.1f}{get_board_region(n)}")
+        print(f"{rank:<6}{n:<10}{int(freq[n - 1]):<8}{expected:<12}{z_scores[n - 1]:<12.3f}{confidence[n - 1]:<14.1f}{get_board_region(n)}")
 
     # Always generate the heatmap (saves to repo regardless of alert)
     img_bytes = generate_heatmap(weighted_scores, confidence, top_10, n_games)
 
-    qualifying = [n for n in top_10 if confidence[n] >= ALERT_THRESHOLD]
+    qualifying = [n for n in top_10 if confidence[n - 1] >= ALERT_THRESHOLD]
     print(f"\n[Analyzer] Numbers above {ALERT_THRESHOLD}% confidence: {len(qualifying)}")
 
     if len(qualifying) >= MIN_NUMBERS_FOR_ALERT:
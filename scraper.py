@@ -1,7 +1,9 @@
 import asyncio
+import logging
 import random
 import os
-import pandas as pd
+import io
+import csv
 from datetime import datetime
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
 
@@ -10,8 +12,41 @@ from playwright.async_api import async_playwright, TimeoutError as PlaywrightTim
 # ==============================================================================
 URL = "https://www.kenousa.com/games/GVR/Green/draws.php"
 CSV_FILE = "results.csv"
+CSV_COLUMNS = ["Game ID", "Timestamp", "Numbers", "Scraped At"]
+IDS_FILE = "results.ids"    # Sidecar of known Game IDs so the CSV isn't re-parsed every run
+STATE_FILE = "browser_state.json"   # Cookies/localStorage reused by the next run's context
 PAGES_TO_COLLECT = 50       # 50 pages x 10 games = 500 games per run
+GAME_ID_MAX = 999           # Game IDs count up to this, then wrap back to 1
 RANDOM_SLEEP_MAX = 120
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}   # innerText needs CSS layout, so stylesheets still load
+LOG_LEVEL = (os.environ.get("LOG_LEVEL") or "INFO").upper()   # DEBUG adds per-page/per-request detail
+DEBUG_SCREENSHOT = os.environ.get("DEBUG_SCREENSHOT", "").lower() in {"1", "true", "yes"}   # Also screenshot successful loads
+
+log = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# HELPER: Game ID sidecar file
+# One ID per line. Each appended block ends with a "#<size>" marker recording the
+# CSV byte size it matches; the sidecar is only trusted when that marker is current.
+# ==============================================================================
+def read_ids_marker():
+    try:
+        with open(IDS_FILE, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 64))
+            tail = f.read().decode().split()
+        return tail[-1] if tail else None
+    except OSError:
+        return None
+
+
+def write_ids_sidecar(ids, csv_size: int, mode: str = "a"):
+    try:
+        with open(IDS_FILE, mode) as f:
+            f.write("".join(f"{game_id}\n" for game_id in ids) + f"#{csv_size}\n")
+    except OSError as e:
+        log.warning("[Warning] Could not write %s: %s", IDS_FILE, e)
 
 
 # ==============================================================================
@@ -20,71 +55,107 @@ RANDOM_SLEEP_MAX = 120
 def load_existing_ids():
     if not os.path.exists(CSV_FILE):
         return set()
+
+    csv_size = os.path.getsize(CSV_FILE)
+    if read_ids_marker() == f"#{csv_size}":
+        with open(IDS_FILE) as f:
+            return {line for line in f.read().split() if not line.startswith("#")}
+
     try:
-        df = pd.read_csv(CSV_FILE, dtype={"Game ID": str})
-        return set(df["Game ID"].str.strip())
+        with open(CSV_FILE, newline="") as f:
+            reader = csv.reader(f)
+            id_col = next(reader).index("Game ID")
+            ids = {row[id_col].strip() for row in reader if row}
     except Exception as e:
-        print(f"[Warning] Could not read existing CSV: {e}")
+        log.warning("[Warning] Could not read existing CSV: %s", e)
         return set()
 
+    log.info("[Start] Rebuilding %s from %s.", IDS_FILE, CSV_FILE)
+    write_ids_sidecar(ids, csv_size, mode="w")
+    return ids
+
 
 # ==============================================================================
-# HELPER: Save new games to CSV
+# HELPER: Game ID that came `steps` games before game_id, following the wrap
+# from 1 back to GAME_ID_MAX
 # ==============================================================================
-def save_new_games(new_games: list, existing_ids: set):
-    if not new_games:
-        print("[Save] No new games to save.")
-        return 0
+def previous_game_id(game_id: int, steps: int = 1) -> int:
+    return (game_id - 1 - steps) % GAME_ID_MAX + 1
 
-    df_new = pd.DataFrame(new_games)
-    df_new = df_new[~df_new["Game ID"].astype(str).isin(existing_ids)]
-    df_new = df_new.drop_duplicates(subset=["Game ID"])
 
-    if df_new.empty:
-        print("[Save] All collected games already exist in the CSV.")
+# ==============================================================================
+# HELPER: Save new games to CSV
+# new_games must already be deduplicated against the CSV and each other;
+# run_scraper filters them during collection.
+# ==============================================================================
+def save_new_games(new_games: list):
+    if not new_games:
+        log.info("[Save] No new games to save.")
         return 0
 
     # Sort numerically, not alphabetically
-    df_new["Game ID"] = df_new["Game ID"].astype(int)
-    df_new = df_new.sort_values("Game ID", ascending=True)
-    df_new["Game ID"] = df_new["Game ID"].astype(str)
+    rows = sorted(new_games, key=lambda g: int(g["Game ID"]))
 
     file_exists = os.path.exists(CSV_FILE)
-    df_new.to_csv(CSV_FILE, mode="a", header=not file_exists, index=False)
-    print(f"[Save] Successfully added {len(df_new)} new games to {CSV_FILE}.")
-    return len(df_new)
+    size_before = os.path.getsize(CSV_FILE) if file_exists else 0
+    sidecar_in_sync = file_exists and read_ids_marker() == f"#{size_before}"
+
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if not file_exists:
+        writer.writerow(CSV_COLUMNS)
+    writer.writerows([game[col] for col in CSV_COLUMNS] for game in rows)
+
+    # Single O_APPEND write so the whole batch lands at the end of the file at once
+    payload = buf.getvalue().encode("utf-8")
+    fd = os.open(CSV_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        while payload:
+            payload = payload[os.write(fd, payload):]
+    finally:
+        os.close(fd)
+    log.info("[Save] Successfully added %d new games to %s.", len(rows), CSV_FILE)
+
+    # A stale sidecar is left alone; the next load rebuilds it from the CSV
+    if sidecar_in_sync:
+        write_ids_sidecar((g["Game ID"] for g in rows), os.path.getsize(CSV_FILE))
+    return len(rows)
 
 
 # ==============================================================================
 # CORE: Extract all game rows currently visible on the page
 # ==============================================================================
-async def extract_visible_games(page) -> list:
+async def extract_visible_games(page, scraped_at: str = None) -> list:
     games = []
     try:
-        game_nums = await page.locator("div.game-num").all()
-        game_dates = await page.locator("div.game-date").all()
-        game_draws = await page.locator("div.game-draw").all()
-
-        print(f"[Extract] Found {len(game_nums)} game-num, {len(game_dates)} game-date, {len(game_draws)} game-draw divs.")
-
-        count = min(len(game_nums), len(game_dates), len(game_draws))
-
-        for i in range(count):
-            game_id = (await game_nums[i].inner_text()).strip()
-            timestamp = (await game_dates[i].inner_text()).strip()
-            raw_numbers = (await game_draws[i].inner_text()).strip()
-            numbers = "-".join(raw_numbers.split())
-
-            if game_id.isdigit() and numbers:
-                games.append({
-                    "Game ID": game_id,
-                    "Timestamp": timestamp,
-                    "Numbers": numbers,
-                    "Scraped At": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
-                })
+        # Read, zip and clean every row in the browser so only finished rows cross CDP
+        result = await page.evaluate(r"""() => {
+            const texts = sel => Array.from(document.querySelectorAll(sel), el => el.innerText.trim());
+            const nums = texts("div.game-num");
+            const dates = texts("div.game-date");
+            const draws = texts("div.game-draw");
+            const rows = [];
+            for (let i = 0; i < Math.min(nums.length, dates.length, draws.length); i++) {
+                const numbers = draws[i].split(/\s+/).filter(Boolean).join("-");
+                if (/^\d+$/.test(nums[i]) && numbers) rows.push([nums[i], dates[i], numbers]);
+            }
+            return {found: [nums.length, dates.length, draws.length], rows};
+        }""")
+
+        log.debug("[Extract] Found %d game-num, %d game-date, %d game-draw divs.", *result["found"])
+
+        if scraped_at is None:
+            scraped_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+        for game_id, timestamp, numbers in result["rows"]:
+            games.append({
+                "Game ID": game_id,
+                "Timestamp": timestamp,
+                "Numbers": numbers,
+                "Scraped At": scraped_at,
+            })
 
     except Exception as e:
-        print(f"[Extract] Error: {e}")
+        log.error("[Extract] Error: %s", e)
 
     return games
 
@@ -101,117 +172,195 @@ async def extract_visible_games(page) -> list:
 # ==============================================================================
 async def click_back_10(page) -> bool:
     try:
-        first_before = (await page.locator("div.game-num").first.inner_text()).strip()
-        print(f"[Nav] First Game ID before click: {first_before}")
-
-        # Always target the back "10" button by fixed position (index 2)
-        back_button = page.locator("button.game-change").nth(2)
-
-        count = await back_button.count()
-        if count == 0:
-            print("[Nav] Back button not found.")
+        # Read the first Game ID, check the button and click it in one round-trip.
+        # Always target the back "10" button by fixed position (index 2); a
+        # "disabled" class means we've reached the oldest available data.
+        result = await page.evaluate("""() => {
+            const first = document.querySelector("div.game-num");
+            const before = first ? first.innerText.trim() : null;
+            const button = document.querySelectorAll("button.game-change")[2];
+            if (!button) return {status: "missing", before};
+            if ((button.getAttribute("class") || "").includes("disabled")) return {status: "disabled", before};
+            button.click();
+            return {status: "clicked", before};
+        }""")
+        first_before = result["before"]
+        log.debug("[Nav] First Game ID before click: %s", first_before)
+
+        if result["status"] == "missing":
+            log.info("[Nav] Back button not found.")
+            return False
+        if result["status"] == "disabled":
+            log.info("[Nav] Back button is disabled. Reached oldest available data.")
             return False
 
-        # Check it's not disabled (means we've reached the oldest available data)
-        cls = await back_button.get_attribute("class") or ""
-        if "disabled" in cls:
-            print("[Nav] Back button is disabled. Reached oldest available data.")
+        log.debug("[Nav] Clicked '10' back button. Waiting for data to update...")
+
+        # Wait for the game divs to update; the predicate runs in the browser on each frame
+        try:
+            handle = await page.wait_for_function(
+                """(before) => {
+                    const el = document.querySelector("div.game-num");
+                    const text = el && el.innerText.trim();
+                    return text && text !== before ? text : null;
+                }""",
+                arg=first_before,
+                timeout=15000,
+            )
+        except PlaywrightTimeout:
+            log.warning("[Nav] Data did not change after clicking.")
             return False
 
-        await back_button.click()
-        print("[Nav] Clicked '10' back button. Waiting for data to update...")
+        first_after = await handle.json_value()
+        log.debug("[Nav] Data updated. First Game ID now: %s", first_after)
+        return True
 
-        # Wait for the game divs to update
-        for _ in range(15):
-            await asyncio.sleep(1)
-            try:
-                first_after = (await page.locator("div.game-num").first.inner_text()).strip()
-                if first_after != first_before:
-                    print(f"[Nav] Data updated. First Game ID now: {first_after}")
-                    return True
-            except:
-                pass
-
-        print("[Nav] Data did not change after clicking.")
+    except Exception as e:
+        log.error("[Nav] Error: %s", e)
         return False
 
+
+# ==============================================================================
+# HELPER: Abort requests for resources the scraper never reads
+# ==============================================================================
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# ==============================================================================
+# HELPER: Log the XHR/fetch calls the page makes, to identify a data endpoint
+# that could replace the browser entirely
+# ==============================================================================
+def log_data_request(request):
+    if request.resource_type in ("xhr", "fetch"):
+        log.debug("[Network] %s %s", request.method, request.url)
+
+
+# ==============================================================================
+# HELPER: Create the scraper's browser context, reusing saved storage state
+# ==============================================================================
+async def new_browser_context(browser):
+    context_options = dict(
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+        viewport={"width": 1280, "height": 720},
+    )
+    # A truncated or incompatible state file only costs the saved cookies
+    try:
+        context = await browser.new_context(
+            storage_state=STATE_FILE if os.path.exists(STATE_FILE) else None,
+            **context_options,
+        )
     except Exception as e:
-        print(f"[Nav] Error: {e}")
-        return False
+        log.warning("[Warning] Could not load %s, starting fresh: %s", STATE_FILE, e)
+        context = await browser.new_context(**context_options)
+    await context.route("**/*", block_heavy_resources)
+    return context
 
 
 # ==============================================================================
 # MAIN SCRAPER
 # ==============================================================================
 async def run_scraper():
-    sleep_seconds = random.randint(0, RANDOM_SLEEP_MAX)
-    print(f"[Start] Sleeping {sleep_seconds}s for randomized staggering...")
-    await asyncio.sleep(sleep_seconds)
-
-    existing_ids = load_existing_ids()
-    print(f"[Start] Loaded {len(existing_ids)} existing Game IDs from CSV.")
-
     all_collected = []
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                       "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-            viewport={"width": 1920, "height": 1080},
-        )
-        page = await context.new_page()
+        # Start the browser during the staggering sleep instead of after it
+        launch_task = asyncio.create_task(p.chromium.launch(headless=True))
 
+        sleep_seconds = random.randint(0, RANDOM_SLEEP_MAX)
+        log.info("[Start] Sleeping %ds for randomized staggering...", sleep_seconds)
+        await asyncio.sleep(sleep_seconds)
+
+        existing_ids = load_existing_ids()
+        log.info("[Start] Loaded %d existing Game IDs from CSV.", len(existing_ids))
+
+        browser = await launch_task
         try:
-            print(f"[Browser] Navigating to {URL}")
+            context = await new_browser_context(browser)
+            page = await context.new_page()
+            if log.isEnabledFor(logging.DEBUG):
+                page.on("request", log_data_request)
+
+            log.info("[Browser] Navigating to %s", URL)
             await page.goto(URL, timeout=60000, wait_until="domcontentloaded")
-            await asyncio.sleep(10)
-            await page.screenshot(path="screenshot.png", full_page=True)
-            print("[Debug] Screenshot saved.")
 
+            # Proceed as soon as the game divs render instead of sleeping a fixed 10s
             try:
-                await page.wait_for_selector("div.game-num", timeout=20000)
-                print("[Setup] Game divs are ready.")
+                await page.wait_for_selector("div.game-num", state="visible", timeout=30000)
+                log.info("[Setup] Game divs are ready.")
             except PlaywrightTimeout:
-                print("[Error] Game divs never appeared. Check screenshot.png.")
+                await page.screenshot(path="screenshot.png", full_page=True)
+                log.error("[Error] Game divs never appeared. Check screenshot.png.")
                 return
 
+            # Failed loads are always captured above; successful ones only when asked
+            if DEBUG_SCREENSHOT:
+                await page.screenshot(path="screenshot.png", full_page=True)
+                log.debug("[Debug] Screenshot saved.")
+
+            try:
+                await context.storage_state(path=STATE_FILE)
+            except Exception as e:
+                log.warning("[Warning] Could not save %s: %s", STATE_FILE, e)
+
             seen_ids_this_run = set()
+            scraped_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
 
             for page_num in range(1, PAGES_TO_COLLECT + 1):
-                print(f"\n[Loop] Scraping page {page_num} of {PAGES_TO_COLLECT}")
+                log.info("[Loop] Scraping page %d of %d", page_num, PAGES_TO_COLLECT)
 
-                page_games = await extract_visible_games(page)
-                print(f"[Loop] Extracted {len(page_games)} games.")
+                page_games = await extract_visible_games(page, scraped_at)
+                log.debug("[Loop] Extracted %d games.", len(page_games))
 
-                new_this_page = 0
+                # Games already in the CSV or seen earlier this run are dropped here
+                page_ids = {game["Game ID"] for game in page_games}
+                new_ids = page_ids - seen_ids_this_run - existing_ids
                 for game in page_games:
-                    if game["Game ID"] not in seen_ids_this_run:
+                    if game["Game ID"] in new_ids and game["Game ID"] not in seen_ids_this_run:
                         seen_ids_this_run.add(game["Game ID"])
                         all_collected.append(game)
-                        new_this_page += 1
 
-                print(f"[Loop] {new_this_page} new unique games. Running total: {len(all_collected)}")
+                log.info("[Loop] %d new unique games. Running total: %d", len(new_ids), len(all_collected))
+
+                # Game IDs are consecutive (wrapping after GAME_ID_MAX), so once a page has
+                # nothing new, paging back only pays off if the remaining pages could still
+                # reach an ID missing from the CSV. Checking every ID in reach, across the
+                # wrap, keeps gaps from short earlier runs backfilled.
+                if page_games and not new_ids:
+                    page_nums = {int(game_id) for game_id in page_ids}
+                    oldest_id = next(n for n in page_nums if previous_game_id(n) not in page_nums)
+                    reach = (PAGES_TO_COLLECT - page_num) * len(page_games)
+                    if all(str(previous_game_id(oldest_id, k)) in existing_ids for k in range(1, reach + 1)):
+                        log.info("[Loop] No unsaved games left within reach. Stopping early.")
+                        break
 
                 if page_num < PAGES_TO_COLLECT:
                     success = await click_back_10(page)
                     if not success:
-                        print("[Loop] Could not go back further. Stopping early.")
+                        log.info("[Loop] Could not go back further. Stopping early.")
                         break
-                    await asyncio.sleep(2)
 
         except Exception as e:
-            print(f"[Fatal] Unexpected error: {e}")
+            log.error("[Fatal] Unexpected error: %s", e)
         finally:
             await browser.close()
 
-    print(f"\n[Summary] Collected {len(all_collected)} total games this run.")
-    saved = save_new_games(all_collected, existing_ids)
-    print(f"[Summary] Run complete. {saved} new games written to disk.")
+    log.info("[Summary] Collected %d total games this run.", len(all_collected))
+    saved = save_new_games(all_collected)
+    log.info("[Summary] Run complete. %d new games written to disk.", saved)
 
 
 # ==============================================================================
 # ENTRY POINT
 # ==============================================================================
 if __name__ == "__main__":
+    # Unknown level names fall back to INFO instead of failing before the run starts
+    level = logging.getLevelName(LOG_LEVEL)
+    logging.basicConfig(level=level if isinstance(level, int) else logging.INFO, format="%(message)s")
+    if not isinstance(level, int):
+        log.warning("[Warning] Unknown LOG_LEVEL %r. Using INFO.", LOG_LEVEL)
     asyncio.run(run_scraper())